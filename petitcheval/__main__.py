@@ -1,11 +1,7 @@
 """Entry point for `python -m petitcheval`."""
 
-import curses
 import sys
 
-from .cli import cli_dump, cli_error, cli_step, cli_task, cli_workspace
-from .db import get_db
-
 HELP = """\
 petitcheval — hierarchical TODO TUI & CLI
 
@@ -30,6 +26,8 @@ Commands:
 
   step list [--task <id>] [--workspace <name|id>] [--status pending|done|all]
   step add <text> --task <id> [-p high|medium|low] [--note <text>]
+           [--step <text> [-p ...] [--note ...]]...
+                                       Add several steps in one transaction
   step done <id>
   step undone <id>
   step edit <id> <text>
@@ -57,6 +55,8 @@ TUI keybindings:
 def main():
     args = sys.argv[1:]
     if not args:
+        import curses
+
         from .tui import tui_main
         curses.wrapper(tui_main)
         return
@@ -65,20 +65,16 @@ def main():
         print(HELP)
         return
 
+    # Imported here so the TUI and --help paths don't pay for them.
+    from .cli import COMMANDS, cli_error
+    from .db import get_db
+
     db = get_db()
     resource = args[0]
-    rest = args[1:]
-
-    if resource == "dump":
-        cli_dump(db, rest)
-    elif resource == "workspace":
-        cli_workspace(db, rest)
-    elif resource == "task":
-        cli_task(db, rest)
-    elif resource == "step":
-        cli_step(db, rest)
-    else:
+    handler = COMMANDS.get(resource)
+    if handler is None:
         cli_error(f"Unknown command: {resource}. Use dump, workspace, task, or step.")
+    handler(db, args[1:])
 
 
 if __name__ == "__main__":
@@ -2,324 +2,488 @@
 
 import json
 import sys
-from datetime import datetime
+from functools import lru_cache
 
+from .db import SQL_NOW
 from .models import (
     dump_all,
     dump_workspace,
     get_steps,
     get_tasks,
+    get_workspace_steps,
     resolve_workspace,
-    set_task_status,
-    step_counts,
+    step_counts_bulk,
 )
 
 
+# Compact, UTF-8 JSON for agents; pretty-printing is only for humans at a TTY.
+_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+def _emit(obj):
+    sys.stdout.write(_encode(obj) + "\n")
+
+
+def _emit_array(items):
+    """Write a JSON array item by item instead of building the list first."""
+    _write_array(map(_encode, items))
+
+
+def _write_array(chunks):
+    write = sys.stdout.write
+    write("[")
+    sep = ""
+    for chunk in chunks:
+        write(sep + chunk)
+        sep = ","
+    write("]\n")
+
+
+# Row templates for the list commands: rows are formatted straight from the
+# SQL tuples, with only the string fields going through the JSON encoder.
+_encode_str = json.encoder.encode_basestring
+_TASK_JSON = (
+    '{"id":%d,"workspace_id":%d,"name":%s,"status":%s,"created_at":%s,'
+    '"steps_total":%d,"steps_done":%d}'
+)
+_STEP_JSON = (
+    '{"id":%d,"task_id":%d,"text":%s,"done":%s,"priority":%s,"note":%s,'
+    '"created_at":%s,"completed_at":%s}'
+)
+
+
+def _json_str(value):
+    return "null" if value is None else _encode_str(value)
+
+
 def cli_error(msg):
     print(json.dumps({"error": msg}), file=sys.stderr)
     sys.exit(1)
 
 
+@lru_cache(maxsize=64)
+def _resolve_ws(db, name_or_id):
+    """resolve_workspace() memoized per (connection, name); cleared on workspace add/rm."""
+    return resolve_workspace(db, name_or_id)
+
+
+_TASK_STATUSES = frozenset({"active", "in_progress", "done"})
+_STEP_STATUSES = frozenset({"pending", "done", "all"})
+_PRIORITIES = frozenset({"high", "medium", "low"})
+
+
+# Flags that take a value, per subcommand.
+_DUMP_FLAGS = frozenset({"--workspace"})
+_TASK_LIST_FLAGS = frozenset({"--workspace", "--status"})
+_TASK_ADD_FLAGS = frozenset({"--workspace"})
+_STEP_LIST_FLAGS = frozenset({"--task", "--workspace", "--status"})
+_STEP_ADD_FLAGS = frozenset({"--task", "-p", "--note", "--step"})
+
+
+def _parse(args, flags):
+    """Split args into ({flag: value}, positionals) in a single pass over the tokens.
+
+    A flag missing its value is kept as a positional; a repeated flag keeps the last value.
+    """
+    opts = {}
+    pos = []
+    it = iter(args)
+    for tok in it:
+        val = next(it, None) if tok in flags else None
+        if val is None:
+            pos.append(tok)
+        else:
+            opts[tok] = val
+    return opts, pos
+
+
+def _parse_step_items(args):
+    """Split `step add` args into (opts, items, grouped).
+
+    Each item is [text_parts, priority, note]. Positional words, -p and --note
+    apply to the current item; every --step starts a new one. `grouped` is true
+    when at least one --step group was parsed.
+    """
+    opts = {}
+    items = [[[], "medium", ""]]
+    leading_opts = False
+    it = iter(args)
+    for tok in it:
+        val = next(it, None) if tok in _STEP_ADD_FLAGS else None
+        if val is None:
+            items[-1][0].append(tok)
+        elif tok == "--step":
+            items.append([[val], "medium", ""])
+        elif tok == "-p":
+            items[-1][1] = val
+            leading_opts |= len(items) == 1
+        elif tok == "--note":
+            items[-1][2] = val
+            leading_opts |= len(items) == 1
+        else:
+            opts[tok] = val
+    grouped = len(items) > 1
+    # Only `--step` groups given: drop the empty leading item, unless -p or
+    # --note were meant for it.
+    if grouped and not items[0][0]:
+        if leading_opts:
+            cli_error("-p and --note before the first --step need step text; put them after --step")
+        items.pop(0)
+    return opts, items, grouped
+
+
 # ── Dump ────────────────────────────────────────────────────────────────────
 
 def cli_dump(db, args):
+    opts, _ = _parse(args, _DUMP_FLAGS)
     ws_id = None
-    i = 0
-    while i < len(args):
-        if args[i] == "--workspace" and i + 1 < len(args):
-            ws = resolve_workspace(db, args[i + 1])
-            if not ws:
-                cli_error(f"Workspace '{args[i + 1]}' not found")
-            ws_id = ws[0]; i += 2
-        else:
-            i += 1
+    if "--workspace" in opts:
+        ws = _resolve_ws(db, opts["--workspace"])
+        if not ws:
+            cli_error(f"Workspace '{opts['--workspace']}' not found")
+        ws_id = ws[0]
 
     if ws_id:
         result = dump_workspace(db, ws_id)
     else:
         result = dump_all(db)
-    print(json.dumps(result, indent=2))
+    if sys.stdout.isatty():
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        _emit(result)
 
 
 # ── Workspace ───────────────────────────────────────────────────────────────
 
+def _workspace_list(db, rest):
+    rows = db.execute("SELECT id, name, created_at FROM workspaces ORDER BY id").fetchall()
+    _emit_array({"id": r[0], "name": r[1], "created_at": r[2]} for r in rows)
+
+
+def _workspace_add(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval workspace add <name>")
+    name = rest[0]
+    if db.execute("SELECT EXISTS(SELECT 1 FROM workspaces WHERE name = ?)", (name,)).fetchone()[0]:
+        cli_error(f"Workspace '{name}' already exists")
+    with db:
+        ws_id, created_at = db.execute(
+            f"INSERT INTO workspaces (name, created_at) VALUES (?, {SQL_NOW}) RETURNING id, created_at",
+            (name,),
+        ).fetchone()
+    _resolve_ws.cache_clear()
+    _emit({"id": ws_id, "name": name, "created_at": created_at})
+
+
+def _workspace_rm(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval workspace rm <id>")
+    ws_id = int(rest[0])
+    with db:
+        if not db.execute("DELETE FROM workspaces WHERE id = ? RETURNING id", (ws_id,)).fetchone():
+            cli_error(f"Workspace {ws_id} not found")
+    _resolve_ws.cache_clear()
+    _emit({"deleted": ws_id})
+
+
+_WORKSPACE_COMMANDS = {
+    "list": _workspace_list,
+    "add": _workspace_add,
+    "rm": _workspace_rm,
+}
+
+
 def cli_workspace(db, args):
     if not args:
         cli_error("Usage: petitcheval workspace <list|add|rm>")
     cmd, rest = args[0], args[1:]
-
-    if cmd == "list":
-        rows = db.execute("SELECT id, name, created_at FROM workspaces ORDER BY id").fetchall()
-        print(json.dumps([{"id": r[0], "name": r[1], "created_at": r[2]} for r in rows]))
-
-    elif cmd == "add":
-        if not rest:
-            cli_error("Usage: petitcheval workspace add <name>")
-        name = rest[0]
-        if db.execute("SELECT 1 FROM workspaces WHERE name = ?", (name,)).fetchone():
-            cli_error(f"Workspace '{name}' already exists")
-        now = datetime.now().isoformat()
-        cur = db.execute("INSERT INTO workspaces (name, created_at) VALUES (?, ?)", (name, now))
-        db.commit()
-        print(json.dumps({"id": cur.lastrowid, "name": name, "created_at": now}))
-
-    elif cmd == "rm":
-        if not rest:
-            cli_error("Usage: petitcheval workspace rm <id>")
-        ws_id = int(rest[0])
-        if not db.execute("SELECT 1 FROM workspaces WHERE id = ?", (ws_id,)).fetchone():
-            cli_error(f"Workspace {ws_id} not found")
-        db.execute("DELETE FROM workspaces WHERE id = ?", (ws_id,))
-        db.commit()
-        print(json.dumps({"deleted": ws_id}))
-
-    else:
+    handler = _WORKSPACE_COMMANDS.get(cmd)
+    if handler is None:
         cli_error(f"Unknown workspace command: {cmd}")
+    handler(db, rest)
 
 
 # ── Task ────────────────────────────────────────────────────────────────────
 
-def cli_task(db, args):
-    if not args:
-        cli_error("Usage: petitcheval task <list|add|start|done|undone|rm>")
-    cmd, rest = args[0], args[1:]
-
-    if cmd == "list":
-        ws_id = None
-        status_filter = None
-        i = 0
-        while i < len(rest):
-            if rest[i] == "--workspace" and i + 1 < len(rest):
-                ws = resolve_workspace(db, rest[i + 1])
-                if not ws:
-                    cli_error(f"Workspace '{rest[i + 1]}' not found")
-                ws_id = ws[0]; i += 2
-            elif rest[i] == "--status" and i + 1 < len(rest):
-                status_filter = rest[i + 1]; i += 2
-            else:
-                i += 1
-        if ws_id:
-            rows = get_tasks(db, ws_id, status_filter=status_filter)
-        else:
-            if status_filter:
-                rows = db.execute(
-                    "SELECT id, workspace_id, name, status, created_at FROM tasks WHERE status = ? ORDER BY id",
-                    (status_filter,),
-                ).fetchall()
-            else:
-                rows = db.execute(
-                    "SELECT id, workspace_id, name, status, created_at FROM tasks ORDER BY id"
-                ).fetchall()
-        out = []
-        for r in rows:
-            total, done = step_counts(db, r[0])
-            out.append({
-                "id": r[0], "workspace_id": r[1], "name": r[2],
-                "status": r[3], "created_at": r[4],
-                "steps_total": total, "steps_done": done,
-            })
-        print(json.dumps(out))
-
-    elif cmd == "add":
-        if not rest:
-            cli_error("Usage: petitcheval task add <name> --workspace <name|id>")
-        name_parts = []
-        ws_val = None
-        i = 0
-        while i < len(rest):
-            if rest[i] == "--workspace" and i + 1 < len(rest):
-                ws_val = rest[i + 1]; i += 2
-            else:
-                name_parts.append(rest[i]); i += 1
-        if not name_parts:
-            cli_error("Task name is required")
-        if ws_val is None:
-            cli_error("--workspace is required")
-        ws = resolve_workspace(db, ws_val)
+def _task_list(db, rest):
+    opts, _ = _parse(rest, _TASK_LIST_FLAGS)
+    ws_id = None
+    status_filter = opts.get("--status")
+    if status_filter is not None and status_filter not in _TASK_STATUSES:
+        cli_error(f"Invalid status: {status_filter}. Use active, in_progress, or done.")
+    if "--workspace" in opts:
+        ws = _resolve_ws(db, opts["--workspace"])
         if not ws:
-            cli_error(f"Workspace '{ws_val}' not found")
-        name = " ".join(name_parts)
-        now = datetime.now().isoformat()
-        cur = db.execute(
-            "INSERT INTO tasks (workspace_id, name, status, created_at) VALUES (?, ?, 'active', ?)",
-            (ws[0], name, now),
-        )
-        db.commit()
-        print(json.dumps({
-            "id": cur.lastrowid, "workspace_id": ws[0], "name": name,
-            "status": "active", "created_at": now,
-        }))
-
-    elif cmd == "start":
-        if not rest:
-            cli_error("Usage: petitcheval task start <id>")
-        tid = int(rest[0])
-        if not db.execute("SELECT 1 FROM tasks WHERE id = ?", (tid,)).fetchone():
+            cli_error(f"Workspace '{opts['--workspace']}' not found")
+        ws_id = ws[0]
+    if ws_id:
+        rows = get_tasks(db, ws_id, status_filter=status_filter)
+    else:
+        if status_filter:
+            rows = db.execute(
+                "SELECT id, workspace_id, name, status, created_at FROM tasks WHERE status = ? ORDER BY id",
+                (status_filter,),
+            ).fetchall()
+        else:
+            rows = db.execute(
+                "SELECT id, workspace_id, name, status, created_at FROM tasks ORDER BY id"
+            ).fetchall()
+    counts = step_counts_bulk(db, (r[0] for r in rows))
+    _write_array(
+        _TASK_JSON % ((r[0], r[1], _encode_str(r[2]), _encode_str(r[3]), _encode_str(r[4]))
+                      + counts.get(r[0], (0, 0)))
+        for r in rows
+    )
+
+
+def _task_add(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval task add <name> --workspace <name|id>")
+    opts, name_parts = _parse(rest, _TASK_ADD_FLAGS)
+    ws_val = opts.get("--workspace")
+    if not name_parts:
+        cli_error("Task name is required")
+    if ws_val is None:
+        cli_error("--workspace is required")
+    ws = _resolve_ws(db, ws_val)
+    if not ws:
+        cli_error(f"Workspace '{ws_val}' not found")
+    name = " ".join(name_parts)
+    with db:
+        task_id, created_at = db.execute(
+            f"INSERT INTO tasks (workspace_id, name, status, created_at) VALUES (?, ?, 'active', {SQL_NOW}) "
+            f"RETURNING id, created_at",
+            (ws[0], name),
+        ).fetchone()
+    _emit({
+        "id": task_id, "workspace_id": ws[0], "name": name,
+        "status": "active", "created_at": created_at,
+    })
+
+
+def _task_start(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval task start <id>")
+    tid = int(rest[0])
+    with db:
+        if not db.execute(
+            "UPDATE tasks SET status = 'in_progress' WHERE id = ? RETURNING id", (tid,)
+        ).fetchone():
             cli_error(f"Task {tid} not found")
-        set_task_status(db, tid, "in_progress")
-        print(json.dumps({"id": tid, "status": "in_progress"}))
-
-    elif cmd == "done":
-        if not rest:
-            cli_error("Usage: petitcheval task done <id>")
-        tid = int(rest[0])
-        if not db.execute("SELECT 1 FROM tasks WHERE id = ?", (tid,)).fetchone():
+    _emit({"id": tid, "status": "in_progress"})
+
+
+def _task_done(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval task done <id>")
+    tid = int(rest[0])
+    with db:
+        if not db.execute(
+            "UPDATE tasks SET status = 'done' WHERE id = ? RETURNING id", (tid,)
+        ).fetchone():
             cli_error(f"Task {tid} not found")
-        set_task_status(db, tid, "done")
-        print(json.dumps({"id": tid, "status": "done"}))
-
-    elif cmd == "undone":
-        if not rest:
-            cli_error("Usage: petitcheval task undone <id>")
-        tid = int(rest[0])
-        if not db.execute("SELECT 1 FROM tasks WHERE id = ?", (tid,)).fetchone():
+    _emit({"id": tid, "status": "done"})
+
+
+def _task_undone(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval task undone <id>")
+    tid = int(rest[0])
+    with db:
+        if not db.execute(
+            "UPDATE tasks SET status = 'active' WHERE id = ? RETURNING id", (tid,)
+        ).fetchone():
             cli_error(f"Task {tid} not found")
-        set_task_status(db, tid, "active")
-        print(json.dumps({"id": tid, "status": "active"}))
-
-    elif cmd == "rm":
-        if not rest:
-            cli_error("Usage: petitcheval task rm <id>")
-        tid = int(rest[0])
-        if not db.execute("SELECT 1 FROM tasks WHERE id = ?", (tid,)).fetchone():
+    _emit({"id": tid, "status": "active"})
+
+
+def _task_rm(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval task rm <id>")
+    tid = int(rest[0])
+    with db:
+        if not db.execute("DELETE FROM tasks WHERE id = ? RETURNING id", (tid,)).fetchone():
             cli_error(f"Task {tid} not found")
-        db.execute("DELETE FROM tasks WHERE id = ?", (tid,))
-        db.commit()
-        print(json.dumps({"deleted": tid}))
+    _emit({"deleted": tid})
 
-    else:
-        cli_error(f"Unknown task command: {cmd}")
 
+_TASK_COMMANDS = {
+    "list": _task_list,
+    "add": _task_add,
+    "start": _task_start,
+    "done": _task_done,
+    "undone": _task_undone,
+    "rm": _task_rm,
+}
 
-# ── Step ────────────────────────────────────────────────────────────────────
 
-def cli_step(db, args):
+def cli_task(db, args):
     if not args:
-        cli_error("Usage: petitcheval step <list|add|done|undone|edit|note|rm>")
+        cli_error("Usage: petitcheval task <list|add|start|done|undone|rm>")
     cmd, rest = args[0], args[1:]
+    handler = _TASK_COMMANDS.get(cmd)
+    if handler is None:
+        cli_error(f"Unknown task command: {cmd}")
+    handler(db, rest)
 
-    if cmd == "list":
-        task_id = None
-        ws_id = None
-        status_filter = "all"
-        i = 0
-        while i < len(rest):
-            if rest[i] == "--task" and i + 1 < len(rest):
-                task_id = int(rest[i + 1]); i += 2
-            elif rest[i] == "--workspace" and i + 1 < len(rest):
-                ws = resolve_workspace(db, rest[i + 1])
-                if not ws:
-                    cli_error(f"Workspace '{rest[i + 1]}' not found")
-                ws_id = ws[0]; i += 2
-            elif rest[i] == "--status" and i + 1 < len(rest):
-                status_filter = rest[i + 1]; i += 2
-            else:
-                i += 1
-
-        if task_id:
-            rows = get_steps(db, task_id, status_filter)
-        elif ws_id:
-            task_rows = get_tasks(db, ws_id)
-            rows = []
-            for t in task_rows:
-                rows.extend(get_steps(db, t[0], status_filter))
-        else:
-            rows = db.execute(
-                "SELECT id, task_id, text, done, priority, created_at, completed_at, note FROM steps ORDER BY id"
-            ).fetchall()
 
-        print(json.dumps([
-            {"id": r[0], "task_id": r[1], "text": r[2], "done": bool(r[3]),
-             "priority": r[4], "note": r[7], "created_at": r[5], "completed_at": r[6]}
-            for r in rows
-        ]))
-
-    elif cmd == "add":
-        if not rest:
-            cli_error("Usage: petitcheval step add <text> --task <id> [-p high|medium|low] [--note <text>]")
-        text_parts = []
-        task_id = None
-        priority = "medium"
-        note = ""
-        i = 0
-        while i < len(rest):
-            if rest[i] == "--task" and i + 1 < len(rest):
-                task_id = int(rest[i + 1]); i += 2
-            elif rest[i] == "-p" and i + 1 < len(rest):
-                priority = rest[i + 1]; i += 2
-            elif rest[i] == "--note" and i + 1 < len(rest):
-                note = rest[i + 1]; i += 2
-            else:
-                text_parts.append(rest[i]); i += 1
-        if not text_parts:
-            cli_error("Step text is required")
-        if task_id is None:
-            cli_error("--task is required")
-        if not db.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone():
-            cli_error(f"Task {task_id} not found")
-        text = " ".join(text_parts)
-        now = datetime.now().isoformat()
-        cur = db.execute(
-            "INSERT INTO steps (task_id, text, priority, note, created_at) VALUES (?, ?, ?, ?, ?)",
-            (task_id, text, priority, note, now),
+# ── Step ────────────────────────────────────────────────────────────────────
+
+def _step_list(db, rest):
+    opts, _ = _parse(rest, _STEP_LIST_FLAGS)
+    task_id = int(opts["--task"]) if "--task" in opts else None
+    ws_id = None
+    status_filter = opts.get("--status", "all")
+    if status_filter not in _STEP_STATUSES:
+        cli_error(f"Invalid status: {status_filter}. Use pending, done, or all.")
+    if "--workspace" in opts:
+        ws = _resolve_ws(db, opts["--workspace"])
+        if not ws:
+            cli_error(f"Workspace '{opts['--workspace']}' not found")
+        ws_id = ws[0]
+
+    if task_id:
+        rows = get_steps(db, task_id, status_filter)
+    elif ws_id:
+        rows = get_workspace_steps(db, ws_id, status_filter)
+    elif status_filter == "all":
+        rows = db.execute(
+            "SELECT id, task_id, text, done, priority, created_at, completed_at, note FROM steps ORDER BY id"
+        ).fetchall()
+    else:
+        rows = db.execute(
+            "SELECT id, task_id, text, done, priority, created_at, completed_at, note FROM steps "
+            "WHERE done = ? ORDER BY id",
+            (int(status_filter == "done"),),
+        ).fetchall()
+
+    _write_array(
+        _STEP_JSON % (
+            r[0], r[1], _encode_str(r[2]), "true" if r[3] else "false", _encode_str(r[4]),
+            _encode_str(r[7]), _encode_str(r[5]), _json_str(r[6]),
+        )
+        for r in rows
+    )
+
+
+def _step_add(db, rest):
+    if not rest:
+        cli_error(
+            "Usage: petitcheval step add <text> --task <id> [-p high|medium|low] [--note <text>] "
+            "[--step <text> [-p ...] [--note ...]]..."
+        )
+    opts, items, grouped = _parse_step_items(rest)
+    task_id = int(opts["--task"]) if "--task" in opts else None
+    if any(not parts for parts, _prio, _note in items):
+        cli_error("Step text is required")
+    for _parts, prio, _note in items:
+        if prio not in _PRIORITIES:
+            cli_error(f"Invalid priority: {prio}. Use high, medium, or low.")
+    if task_id is None:
+        cli_error("--task is required")
+    if not db.execute("SELECT EXISTS(SELECT 1 FROM tasks WHERE id = ?)", (task_id,)).fetchone()[0]:
+        cli_error(f"Task {task_id} not found")
+    rows = [(task_id, " ".join(parts), prio, note) for parts, prio, note in items]
+    with db:
+        db.executemany(
+            f"INSERT INTO steps (task_id, text, priority, note, created_at) VALUES (?, ?, ?, ?, {SQL_NOW})",
+            rows,
         )
-        db.commit()
-        print(json.dumps({
-            "id": cur.lastrowid, "task_id": task_id, "text": text,
-            "priority": priority, "note": note, "done": False,
-        }))
-
-    elif cmd == "done":
-        if not rest:
-            cli_error("Usage: petitcheval step done <id>")
-        sid = int(rest[0])
-        if not db.execute("SELECT 1 FROM steps WHERE id = ?", (sid,)).fetchone():
+        last_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+    # The write lock is held for the whole transaction, so AUTOINCREMENT ids are consecutive.
+    first_id = last_id - len(rows) + 1
+    added = [
+        {"id": first_id + k, "task_id": task_id, "text": text,
+         "priority": prio, "note": note, "done": False}
+        for k, (_tid, text, prio, note) in enumerate(rows)
+    ]
+    if grouped:
+        _emit(added)
+    else:
+        _emit(added[0])
+
+
+def _step_done(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval step done <id>")
+    sid = int(rest[0])
+    with db:
+        if not db.execute(
+            f"UPDATE steps SET done = 1, completed_at = {SQL_NOW} WHERE id = ? RETURNING id",
+            (sid,),
+        ).fetchone():
             cli_error(f"Step {sid} not found")
-        db.execute("UPDATE steps SET done = 1, completed_at = ? WHERE id = ?", (datetime.now().isoformat(), sid))
-        db.commit()
-        print(json.dumps({"id": sid, "done": True}))
-
-    elif cmd == "undone":
-        if not rest:
-            cli_error("Usage: petitcheval step undone <id>")
-        sid = int(rest[0])
-        if not db.execute("SELECT 1 FROM steps WHERE id = ?", (sid,)).fetchone():
+    _emit({"id": sid, "done": True})
+
+
+def _step_undone(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval step undone <id>")
+    sid = int(rest[0])
+    with db:
+        if not db.execute(
+            "UPDATE steps SET done = 0, completed_at = NULL WHERE id = ? RETURNING id", (sid,)
+        ).fetchone():
             cli_error(f"Step {sid} not found")
-        db.execute("UPDATE steps SET done = 0, completed_at = NULL WHERE id = ?", (sid,))
-        db.commit()
-        print(json.dumps({"id": sid, "done": False}))
-
-    elif cmd == "edit":
-        if len(rest) < 2:
-            cli_error("Usage: petitcheval step edit <id> <text>")
-        sid = int(rest[0])
-        new_text = " ".join(rest[1:])
-        if not db.execute("SELECT 1 FROM steps WHERE id = ?", (sid,)).fetchone():
+    _emit({"id": sid, "done": False})
+
+
+def _step_edit(db, rest):
+    if len(rest) < 2:
+        cli_error("Usage: petitcheval step edit <id> <text>")
+    sid = int(rest[0])
+    new_text = " ".join(rest[1:])
+    with db:
+        if not db.execute("UPDATE steps SET text = ? WHERE id = ? RETURNING id", (new_text, sid)).fetchone():
             cli_error(f"Step {sid} not found")
-        db.execute("UPDATE steps SET text = ? WHERE id = ?", (new_text, sid))
-        db.commit()
-        print(json.dumps({"id": sid, "text": new_text}))
-
-    elif cmd == "note":
-        if len(rest) < 2:
-            cli_error("Usage: petitcheval step note <id> <text>")
-        sid = int(rest[0])
-        new_note = " ".join(rest[1:])
-        if not db.execute("SELECT 1 FROM steps WHERE id = ?", (sid,)).fetchone():
+    _emit({"id": sid, "text": new_text})
+
+
+def _step_note(db, rest):
+    if len(rest) < 2:
+        cli_error("Usage: petitcheval step note <id> <text>")
+    sid = int(rest[0])
+    new_note = " ".join(rest[1:])
+    with db:
+        if not db.execute("UPDATE steps SET note = ? WHERE id = ? RETURNING id", (new_note, sid)).fetchone():
             cli_error(f"Step {sid} not found")
-        db.execute("UPDATE steps SET note = ? WHERE id = ?", (new_note, sid))
-        db.commit()
-        print(json.dumps({"id": sid, "note": new_note}))
-
-    elif cmd == "rm":
-        if not rest:
-            cli_error("Usage: petitcheval step rm <id>")
-        sid = int(rest[0])
-        if not db.execute("SELECT 1 FROM steps WHERE id = ?", (sid,)).fetchone():
+    _emit({"id": sid, "note": new_note})
+
+
+def _step_rm(db, rest):
+    if not rest:
+        cli_error("Usage: petitcheval step rm <id>")
+    sid = int(rest[0])
+    with db:
+        if not db.execute("DELETE FROM steps WHERE id = ? RETURNING id", (sid,)).fetchone():
             cli_error(f"Step {sid} not found")
-        db.execute("DELETE FROM steps WHERE id = ?", (sid,))
-        db.commit()
-        print(json.dumps({"deleted": sid}))
+    _emit({"deleted": sid})
 
-    else:
+
+_STEP_COMMANDS = {
+    "list": _step_list,
+    "add": _step_add,
+    "done": _step_done,
+    "undone": _step_undone,
+    "edit": _step_edit,
+    "note": _step_note,
+    "rm": _step_rm,
+}
+
+
+def cli_step(db, args):
+    if not args:
+        cli_error("Usage: petitcheval step <list|add|done|undone|edit|note|rm>")
+    cmd, rest = args[0], args[1:]
+    handler = _STEP_COMMANDS.get(cmd)
+    if handler is None:
         cli_error(f"Unknown step command: {cmd}")
+    handler(db, rest)
+
+
+COMMANDS = {
+    "dump": cli_dump,
+    "workspace": cli_workspace,
+    "task": cli_task,
+    "step": cli_step,
+}
@@ -1,15 +1,47 @@
 """Database connection, schema creation, and migrations."""
 
+import atexit
 import os
 import sqlite3
-from datetime import datetime
+from urllib.parse import quote
 
 DB_PATH = os.path.join(os.path.expanduser("~"), ".todo.db")
 
 
+# sqlite3 keeps an LRU of compiled statements per connection, keyed by SQL
+# text, so repeated db.execute() of the same literal skips re-preparing.
+STATEMENT_CACHE_SIZE = 256
+
+# Local time in the same shape the rows already hold, computed by SQLite inside
+# the statement instead of formatted in Python and bound as a parameter.
+SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# Stored in PRAGMA user_version once the migrations have run; bump it when
+# adding a migration. 1: legacy tables migrated. 2: search index attempted.
+SCHEMA_VERSION = 2
+
+# One read-write connection per database path for the life of the process, so
+# repeat get_db() calls don't redo the schema checks or stack exit hooks.
+_connections = {}
+
+
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connections.get(DB_PATH)
+    if conn is not None:
+        return conn
+    # Callers index rows positionally (r[0], r[1], ...): keep plain tuple rows
+    # and skip declared-type converter lookups on every fetched row.
+    conn = sqlite3.connect(DB_PATH, detect_types=0, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = None
     conn.execute("PRAGMA foreign_keys = ON")
+    # WAL + NORMAL sync: one fsync per checkpoint instead of per commit.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -64000")  # 64 MiB
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256 MiB
+    _connections[DB_PATH] = conn
+    atexit.register(_close, conn)
 
     conn.execute(
         """CREATE TABLE IF NOT EXISTS workspaces (
@@ -39,28 +71,79 @@ def get_db():
             completed_at TEXT
         )"""
     )
+    # steps is a rowid table, so "ORDER BY id" over all steps is already a plain
+    # scan with no sort; what needs an index is every per-task lookup. Both
+    # indexes lead with the lookup column and carry the filter/sort columns:
+    # step counts are answered from idx_steps_task alone, and status filters
+    # find their rows through idx_tasks_ws_status, then read name/created_at
+    # from the table.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_ws_status ON tasks(workspace_id, status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_steps_task ON steps(task_id, done, priority, id)")
 
-    _migrate_flat_todos(conn)
-    _migrate_plans(conn)
-    _migrate_add_note_column(conn)
+    # The migrations probe for legacy tables and columns with queries that fail
+    # on a current database; skip them entirely once it is known to be current.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        _migrate_flat_todos(conn)
+        _migrate_plans(conn)
+        _migrate_add_note_column(conn)
+    if version < 2:
+        # Tried once: a SQLite without FTS5 won't grow it between runs.
+        _create_search_index(conn)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
     # Ensure at least one workspace exists
     if not conn.execute("SELECT 1 FROM workspaces LIMIT 1").fetchone():
-        now = datetime.now().isoformat()
-        conn.execute("INSERT INTO workspaces (name, created_at) VALUES ('default', ?)", (now,))
+        conn.execute(f"INSERT INTO workspaces (name, created_at) VALUES ('default', {SQL_NOW})")
         conn.commit()
 
     return conn
 
 
+def get_db_ro():
+    """Open a read-only connection to the database get_db() has already set up.
+
+    It never takes a write lock or runs migrations; under WAL it reads the
+    last committed state without waiting on the writer.
+    """
+    conn = sqlite3.connect(
+        f"file:{quote(DB_PATH)}?mode=ro", uri=True,
+        detect_types=0, cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = None
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -64000")  # 64 MiB
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256 MiB
+    # Not _close: PRAGMA optimize may want to ANALYZE, which a read-only handle can't.
+    atexit.register(conn.close)
+    return conn
+
+
+def _close(conn):
+    """Refresh planner statistics for tables that need it, then close.
+
+    Best effort: another process holding the write lock must neither delay
+    exit nor print a traceback.
+    """
+    try:
+        conn.execute("PRAGMA busy_timeout = 0")
+        # Bound the ANALYZE that optimize may run so exit stays fast on big tables.
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass  # locked by another writer, or already closed
+    finally:
+        conn.close()
+
+
 def _ensure_default_workspace_task(conn):
     """Return (workspace_id, task_id) for the 'default' workspace + task, creating if needed."""
-    now = datetime.now().isoformat()
     row = conn.execute("SELECT id FROM workspaces WHERE name = 'default'").fetchone()
     if row:
         ws_id = row[0]
     else:
-        cur = conn.execute("INSERT INTO workspaces (name, created_at) VALUES ('default', ?)", (now,))
+        cur = conn.execute(f"INSERT INTO workspaces (name, created_at) VALUES ('default', {SQL_NOW})")
         ws_id = cur.lastrowid
 
     row = conn.execute("SELECT id FROM tasks WHERE workspace_id = ? AND name = 'default'", (ws_id,)).fetchone()
@@ -68,8 +151,8 @@ def _ensure_default_workspace_task(conn):
         task_id = row[0]
     else:
         cur = conn.execute(
-            "INSERT INTO tasks (workspace_id, name, status, created_at) VALUES (?, 'default', 'active', ?)",
-            (ws_id, now),
+            f"INSERT INTO tasks (workspace_id, name, status, created_at) VALUES (?, 'default', 'active', {SQL_NOW})",
+            (ws_id,),
         )
         task_id = cur.lastrowid
     return ws_id, task_id
@@ -89,12 +172,11 @@ def _migrate_flat_todos(conn):
 
     _ws_id, task_id = _ensure_default_workspace_task(conn)
 
-    old_todos = conn.execute("SELECT task, done, priority, created_at, completed_at FROM todos").fetchall()
-    for t in old_todos:
-        conn.execute(
-            "INSERT INTO steps (task_id, text, done, priority, created_at, completed_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (task_id, t[0], t[1], t[2], t[3], t[4]),
-        )
+    old_todos = conn.execute("SELECT task, done, priority, created_at, completed_at FROM todos")
+    conn.executemany(
+        "INSERT INTO steps (task_id, text, done, priority, created_at, completed_at) VALUES (?, ?, ?, ?, ?, ?)",
+        ((task_id,) + t for t in old_todos.fetchall()),
+    )
     conn.execute("DROP TABLE todos")
     conn.commit()
 
@@ -109,6 +191,7 @@ def _migrate_plans(conn):
     plans = conn.execute(
         "SELECT p.id, p.workspace_id, p.name, p.status, p.created_at FROM plans p"
     ).fetchall()
+    new_steps = []
     for plan in plans:
         plan_id, ws_id, pname, pstatus, pcreated = plan
         existing = conn.execute(
@@ -127,13 +210,13 @@ def _migrate_plans(conn):
                 "SELECT task, done, priority, created_at, completed_at FROM todos WHERE plan_id = ?",
                 (plan_id,),
             ).fetchall()
-            for t in old_todos:
-                conn.execute(
-                    "INSERT INTO steps (task_id, text, done, priority, created_at, completed_at) VALUES (?, ?, ?, ?, ?, ?)",
-                    (new_task_id, t[0], t[1], t[2], t[3], t[4]),
-                )
+            new_steps.extend((new_task_id,) + t for t in old_todos)
         except sqlite3.OperationalError:
             pass
+    conn.executemany(
+        "INSERT INTO steps (task_id, text, done, priority, created_at, completed_at) VALUES (?, ?, ?, ?, ?, ?)",
+        new_steps,
+    )
     try:
         conn.execute("DROP TABLE todos")
     except sqlite3.OperationalError:
@@ -148,3 +231,52 @@ def _migrate_add_note_column(conn):
     if "note" not in cols:
         conn.execute("ALTER TABLE steps ADD COLUMN note TEXT NOT NULL DEFAULT ''")
         conn.commit()
+
+
+def _create_search_index(conn):
+    """Create trigram FTS5 indexes over task names and step text/notes, kept in sync by triggers.
+
+    Skipped when SQLite lacks FTS5 or the trigram tokenizer (3.34+); search
+    then falls back to LIKE scans.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'steps_fts'").fetchone():
+        return
+    conn.execute("BEGIN")
+    try:
+        for stmt in _SEARCH_INDEX_DDL:
+            conn.execute(stmt)
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return
+    conn.commit()
+
+
+_SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5("
+    "name, content='tasks', content_rowid='id', tokenize='trigram')",
+    "CREATE VIRTUAL TABLE steps_fts USING fts5("
+    "text, note, content='steps', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER tasks_fts_au AFTER UPDATE OF name ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO tasks_fts (rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER steps_fts_ai AFTER INSERT ON steps BEGIN
+        INSERT INTO steps_fts (rowid, text, note) VALUES (new.id, new.text, new.note);
+    END""",
+    """CREATE TRIGGER steps_fts_ad AFTER DELETE ON steps BEGIN
+        INSERT INTO steps_fts (steps_fts, rowid, text, note) VALUES ('delete', old.id, old.text, old.note);
+    END""",
+    """CREATE TRIGGER steps_fts_au AFTER UPDATE OF text, note ON steps BEGIN
+        INSERT INTO steps_fts (steps_fts, rowid, text, note) VALUES ('delete', old.id, old.text, old.note);
+        INSERT INTO steps_fts (rowid, text, note) VALUES (new.id, new.text, new.note);
+    END""",
+    # Index the rows that existed before the tables did.
+    "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    "INSERT INTO steps_fts (steps_fts) VALUES ('rebuild')",
+)
@@ -1,6 +1,6 @@
 """CRUD helpers for workspaces, tasks, and steps."""
 
-from datetime import datetime
+from .db import SQL_NOW
 
 
 # ── Workspaces ──────────────────────────────────────────────────────────────
@@ -14,9 +14,6 @@ def resolve_workspace(db, name_or_id):
 
 # ── Tasks ───────────────────────────────────────────────────────────────────
 
-TASK_STATUS_ORDER = {"active": 0, "in_progress": 1, "done": 2}
-
-
 def get_tasks(db, workspace_id, status_filter=None):
     if status_filter:
         return db.execute(
@@ -31,14 +28,6 @@ def get_tasks(db, workspace_id, status_filter=None):
     ).fetchall()
 
 
-def set_task_status(db, task_id, status):
-    """Set task status. Valid: active, in_progress, done."""
-    if status not in TASK_STATUS_ORDER:
-        raise ValueError(f"Invalid status: {status}")
-    db.execute("UPDATE tasks SET status = ? WHERE id = ?", (status, task_id))
-    db.commit()
-
-
 # ── Steps ───────────────────────────────────────────────────────────────────
 
 def get_steps(db, task_id, status_filter="all"):
@@ -55,18 +44,139 @@ def get_steps(db, task_id, status_filter="all"):
     ).fetchall()
 
 
-def step_counts(db, task_id):
-    row = db.execute(
-        "SELECT COUNT(*), SUM(done) FROM steps WHERE task_id = ?", (task_id,)
-    ).fetchone()
-    return row[0], int(row[1] or 0)
+def get_workspace_steps(db, workspace_id, status_filter="all"):
+    """All steps of a workspace in one JOIN, ordered as get_tasks() then get_steps() would."""
+    clause = ""
+    if status_filter == "pending":
+        clause = " AND s.done = 0"
+    elif status_filter == "done":
+        clause = " AND s.done = 1"
+    return db.execute(
+        f"SELECT s.id, s.task_id, s.text, s.done, s.priority, s.created_at, s.completed_at, s.note "
+        f"FROM steps s JOIN tasks t ON s.task_id = t.id "
+        f"WHERE t.workspace_id = ?{clause} "
+        f"ORDER BY CASE t.status WHEN 'in_progress' THEN 0 WHEN 'active' THEN 1 ELSE 2 END, t.id, "
+        f"s.done, CASE s.priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 ELSE 2 END, s.id",
+        (workspace_id,),
+    ).fetchall()
+
+
+def _like_pattern(text):
+    """LIKE pattern matching text anywhere, with LIKE's wildcards escaped (ESCAPE '\\')."""
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _lower_ascii(col):
+    """SQL for col with the only non-ASCII characters whose str.lower() has ASCII
+    letters in it, U+0130 (-> "i" U+0307) and U+212A Kelvin sign (-> "k"),
+    replaced the same way, so an ASCII LIKE on it agrees with str.lower()."""
+    return f"replace(replace({col}, char(304), 'i' || char(775)), char(8490), 'k')"
+
+
+def _has_search_index(db):
+    """True if get_db() could create the FTS5 search tables on this database."""
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'steps_fts'").fetchone() is not None
+
+
+def get_tree(db, workspace_id, collapsed=(), include_done=True, search="", name_query=""):
+    """Return a workspace's task/step tree as one row stream, in display order.
+
+    Rows are (kind, id, task_id, label, state, done, total, note): kind 0 is a
+    task (label=name, state=status, done/total=step counts, note=None) and is
+    followed by its steps, kind 1 (label=text, state=priority, total=None).
+    Steps of collapsed tasks are left out.
+
+    search filters in SQL: tasks whose name or any step matches, with all
+    their steps if the name matches and only the matching ones otherwise. An
+    ASCII search matches exactly where `search.lower() in text.lower()` would.
+    It uses the trigram FTS5 index when there is one and the search is long
+    enough to form a trigram and has no "i", and LIKE scans otherwise.
+
+    name_query is for callers that filter themselves: collapsed tasks whose
+    name does not contain it still get their steps, since a search has to
+    look inside those.
+    """
+    clause = "" if include_done else " AND t.status != 'done'"
+    collapsed = list(collapsed)
+    skip = f"s.task_id NOT IN ({','.join('?' * len(collapsed))})"
+    task_params = [workspace_id]
+    step_params = [workspace_id, *collapsed]
+    if name_query:
+        # SQLite's lower() only folds ASCII, so this can miss a match and fetch
+        # steps the caller ignores, but never drops steps a search needs.
+        skip = f"({skip} OR instr(lower(t.name), ?) = 0)"
+        step_params.append(name_query)
+    task_where = f"t.workspace_id = ?{clause}"
+    step_where = f"t.workspace_id = ?{clause} AND {skip}"
+    lowered = search.lower()
+    # The trigram index doesn't fold U+0130 to "i" as str.lower() does, so a
+    # search with an "i" scans; it does fold U+017F (long s) to "s", which
+    # str.lower() doesn't, so hits for a search with an "s" are rechecked.
+    use_index = len(search) >= 3 and "i" not in lowered and _has_search_index(db)
+    if use_index:
+        # A quoted phrase of trigrams is a substring match answered by the index.
+        phrase = '"' + search.replace('"', '""') + '"'
+        task_hit = "t.id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)"
+        step_hits = "(SELECT rowid FROM steps_fts WHERE steps_fts MATCH ?)"
+        task_where += f" AND ({task_hit} OR t.id IN (SELECT task_id FROM steps WHERE id IN {step_hits}))"
+        step_where += f" AND ({task_hit} OR s.id IN {step_hits})"
+        task_params += [phrase, phrase]
+        step_params += [phrase, phrase]
+    if search and (not use_index or "s" in lowered):
+        pat = _like_pattern(search)
+        col = _lower_ascii if "i" in lowered or "k" in lowered else str
+        task_where += (
+            f" AND ({col('t.name')} LIKE ? ESCAPE '\\' OR EXISTS (SELECT 1 FROM steps m WHERE m.task_id = t.id "
+            f"AND ({col('m.text')} LIKE ? ESCAPE '\\' OR {col('m.note')} LIKE ? ESCAPE '\\')))"
+        )
+        step_where += (
+            f" AND ({col('t.name')} LIKE ? ESCAPE '\\' OR {col('s.text')} LIKE ? ESCAPE '\\' "
+            f"OR {col('s.note')} LIKE ? ESCAPE '\\')"
+        )
+        task_params += [pat, pat, pat]
+        step_params += [pat, pat, pat]
+    rank = "CASE t.status WHEN 'in_progress' THEN 0 WHEN 'active' THEN 1 ELSE 2 END"
+    return db.execute(
+        f"SELECT kind, id, task_id, label, state, done, total, note FROM ("
+        f"SELECT 0 AS kind, t.id AS id, t.id AS task_id, t.name AS label, t.status AS state, "
+        f"COALESCE(SUM(s.done), 0) AS done, COUNT(s.id) AS total, NULL AS note, "
+        f"{rank} AS task_rank, 0 AS prio_rank "
+        f"FROM tasks t LEFT JOIN steps s ON s.task_id = t.id "
+        f"WHERE {task_where} GROUP BY t.id "
+        f"UNION ALL "
+        f"SELECT 1, s.id, s.task_id, s.text, s.priority, s.done, NULL, s.note, {rank}, "
+        f"CASE s.priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 ELSE 2 END "
+        f"FROM steps s JOIN tasks t ON s.task_id = t.id "
+        f"WHERE {step_where}"
+        f") ORDER BY task_rank, task_id, kind, done, prio_rank, id",
+        task_params + step_params,
+    )
+
+
+def step_counts_bulk(db, task_ids):
+    """Return {task_id: (total, done)} for many tasks with one GROUP BY query.
+
+    Tasks without steps are absent from the result.
+    """
+    counts = {}
+    task_ids = list(task_ids)
+    # Stay under SQLite's bound-parameter limit on older builds (999).
+    for start in range(0, len(task_ids), 500):
+        chunk = task_ids[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        for tid, total, done in db.execute(
+            f"SELECT task_id, COUNT(*), COALESCE(SUM(done), 0) FROM steps WHERE task_id IN ({marks}) "
+            f"GROUP BY task_id",
+            chunk,
+        ):
+            counts[tid] = (total, done)
+    return counts
 
 
 def add_step(db, task_id, text, priority="medium", note=""):
-    now = datetime.now().isoformat()
     cur = db.execute(
-        "INSERT INTO steps (task_id, text, priority, note, created_at) VALUES (?, ?, ?, ?, ?)",
-        (task_id, text, priority, note, now),
+        f"INSERT INTO steps (task_id, text, priority, note, created_at) VALUES (?, ?, ?, ?, {SQL_NOW})",
+        (task_id, text, priority, note),
     )
     db.commit()
     return cur.lastrowid
@@ -74,29 +184,52 @@ def add_step(db, task_id, text, priority="medium", note=""):
 
 # ── Dump ────────────────────────────────────────────────────────────────────
 
+def _dump_workspaces(db, workspaces, where="", params=()):
+    """Nest tasks and steps under the given workspace rows with one query per level."""
+    tasks_by_ws = {ws[0]: [] for ws in workspaces}
+    steps_by_task = {}
+    for tid, ws_id, name, status, created_at, total, done in db.execute(
+        f"SELECT t.id, t.workspace_id, t.name, t.status, t.created_at, COUNT(s.id), COALESCE(SUM(s.done), 0) "
+        f"FROM tasks t LEFT JOIN steps s ON s.task_id = t.id{where} GROUP BY t.id "
+        f"ORDER BY t.workspace_id, CASE t.status WHEN 'in_progress' THEN 0 WHEN 'active' THEN 1 ELSE 2 END, t.id",
+        params,
+    ):
+        ws_tasks = tasks_by_ws.get(ws_id)
+        if ws_tasks is None:
+            continue  # workspace deleted with foreign keys off; leave its tasks out
+        steps = steps_by_task[tid] = []
+        ws_tasks.append({
+            "id": tid, "name": name, "status": status, "created_at": created_at,
+            "steps_total": total, "steps_done": done, "steps": steps,
+        })
+    for s in db.execute(
+        f"SELECT s.id, s.task_id, s.text, s.done, s.priority, s.created_at, s.completed_at, s.note "
+        f"FROM steps s JOIN tasks t ON s.task_id = t.id{where} "
+        f"ORDER BY s.task_id, s.done, CASE s.priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 ELSE 2 END, s.id",
+        params,
+    ):
+        task_steps = steps_by_task.get(s[1])
+        if task_steps is None:
+            continue  # under a task left out above
+        task_steps.append(
+            {"id": s[0], "text": s[2], "done": bool(s[3]), "priority": s[4],
+             "note": s[7], "created_at": s[5], "completed_at": s[6]}
+        )
+    return [
+        {"id": ws[0], "name": ws[1], "created_at": ws[2], "tasks": tasks_by_ws[ws[0]]}
+        for ws in workspaces
+    ]
+
+
 def dump_workspace(db, workspace_id):
     """Return full nested dict for a workspace: tasks → steps."""
     ws = db.execute("SELECT id, name, created_at FROM workspaces WHERE id = ?", (workspace_id,)).fetchone()
     if not ws:
         return None
-    tasks = get_tasks(db, workspace_id)
-    task_list = []
-    for t in tasks:
-        total, done = step_counts(db, t[0])
-        steps = get_steps(db, t[0])
-        task_list.append({
-            "id": t[0], "name": t[2], "status": t[3], "created_at": t[4],
-            "steps_total": total, "steps_done": done,
-            "steps": [
-                {"id": s[0], "text": s[2], "done": bool(s[3]), "priority": s[4],
-                 "note": s[7], "created_at": s[5], "completed_at": s[6]}
-                for s in steps
-            ],
-        })
-    return {"id": ws[0], "name": ws[1], "created_at": ws[2], "tasks": task_list}
+    return _dump_workspaces(db, [ws], " WHERE t.workspace_id = ?", (workspace_id,))[0]
 
 
 def dump_all(db):
     """Return full nested dict for all workspaces."""
-    workspaces = db.execute("SELECT id FROM workspaces ORDER BY id").fetchall()
-    return [dump_workspace(db, ws[0]) for ws in workspaces]
+    workspaces = db.execute("SELECT id, name, created_at FROM workspaces ORDER BY id").fetchall()
+    return _dump_workspaces(db, workspaces)
@@ -1,13 +1,43 @@
 """Curses-based TUI — collapsible tree view of tasks and steps."""
 
 import curses
-from datetime import datetime
-
-from .models import get_steps, get_tasks, step_counts
+from itertools import groupby
+from operator import itemgetter
+from time import monotonic
+from unicodedata import combining, east_asian_width
+
+from .db import SQL_NOW
+from .models import get_tree
+
+
+# ── SQL ─────────────────────────────────────────────────────────────────────
+
+# Shared by every keystroke handler so each statement is prepared once and
+# then served from the connection's statement cache.
+SQL_FIRST_WORKSPACE = "SELECT id, name FROM workspaces ORDER BY id LIMIT 1"
+SQL_LIST_WORKSPACES = "SELECT id, name FROM workspaces ORDER BY id"
+SQL_WORKSPACE_EXISTS = "SELECT 1 FROM workspaces WHERE name = ?"
+SQL_INSERT_WORKSPACE = f"INSERT INTO workspaces (name, created_at) VALUES (?, {SQL_NOW})"
+SQL_INSERT_TASK = f"INSERT INTO tasks (workspace_id, name, status, created_at) VALUES (?, ?, 'active', {SQL_NOW})"
+SQL_SET_TASK_STATUS = "UPDATE tasks SET status = ? WHERE id = ?"
+SQL_RENAME_TASK = "UPDATE tasks SET name = ? WHERE id = ?"
+SQL_DELETE_TASK = "DELETE FROM tasks WHERE id = ?"
+SQL_INSERT_STEP = f"INSERT INTO steps (task_id, text, priority, note, created_at) VALUES (?, ?, 'medium', '', {SQL_NOW})"
+SQL_STEP_DONE = f"UPDATE steps SET done = 1, completed_at = {SQL_NOW} WHERE id = ?"
+SQL_STEP_UNDONE = "UPDATE steps SET done = 0, completed_at = NULL WHERE id = ?"
+SQL_SET_STEP_TEXT = "UPDATE steps SET text = ? WHERE id = ?"
+SQL_SET_STEP_NOTE = "UPDATE steps SET note = ? WHERE id = ?"
+SQL_SET_STEP_PRIORITY = "UPDATE steps SET priority = ? WHERE id = ?"
+SQL_DELETE_STEP = "DELETE FROM steps WHERE id = ?"
 
 
 # ── Input widgets ───────────────────────────────────────────────────────────
 
+def single_width(chars):
+    """True if every character takes exactly one terminal column."""
+    return all(c.isascii() or (east_asian_width(c) not in ("W", "F") and not combining(c)) for c in chars)
+
+
 def textbox_input(stdscr, prompt, prefill=""):
     """Single-line text input at the bottom of screen. Returns string or None on ESC."""
     h, w = stdscr.getmaxyx()
@@ -21,13 +51,24 @@ def textbox_input(stdscr, prompt, prefill=""):
     curses.curs_set(1)
     buf = list(prefill)
     cursor = len(buf)
+    input_y = y + 1
+    stdscr.move(input_y, 0)
+    stdscr.clrtoeol()
+    # Characters left of dirty_from are already on screen; an edit only repaints
+    # from where it happened, and cursor movement repaints nothing.
+    dirty_from = 0
 
     while True:
-        input_y = y + 1
-        stdscr.move(input_y, 0)
-        stdscr.clrtoeol()
-        display = "".join(buf)
-        stdscr.addnstr(input_y, 1, display, w - 2)
+        if dirty_from and not single_width(buf[:dirty_from]):
+            # Wide or combining characters put the edit at another column:
+            # repaint the whole line.
+            dirty_from = 0
+        if dirty_from is not None:
+            if 1 + dirty_from < w - 1:
+                stdscr.move(input_y, 1 + dirty_from)
+                stdscr.clrtoeol()
+                stdscr.addnstr(input_y, 1 + dirty_from, "".join(buf[dirty_from:]), w - 2 - dirty_from)
+            dirty_from = None
         stdscr.move(input_y, 1 + cursor)
         stdscr.refresh()
 
@@ -42,9 +83,11 @@ def textbox_input(stdscr, prompt, prefill=""):
             if cursor > 0:
                 buf.pop(cursor - 1)
                 cursor -= 1
+                dirty_from = cursor
         elif ch == curses.KEY_DC:
             if cursor < len(buf):
                 buf.pop(cursor)
+                dirty_from = cursor
         elif ch == curses.KEY_LEFT:
             cursor = max(0, cursor - 1)
         elif ch == curses.KEY_RIGHT:
@@ -55,6 +98,7 @@ def textbox_input(stdscr, prompt, prefill=""):
             cursor = len(buf)
         elif isinstance(ch, str) and len(ch) == 1 and ch.isprintable():
             buf.insert(cursor, ch)
+            dirty_from = cursor
             cursor += 1
 
 
@@ -109,65 +153,160 @@ TASK_STATUS_ICON = {
 }
 
 
+TASK, STEP = 0, 1  # Tree.kinds values, as returned by models.get_tree()
+
+
+class Tree:
+    """Rendered rows stored column-wise: row i is kinds[i], ids[i], labels[i], ...
+
+    Columns follow models.get_tree(): task_ids is the row's own id for tasks;
+    labels/states hold name/status for tasks and text/priority for steps;
+    totals and notes are None on step and task rows respectively.
+    """
+
+    __slots__ = ("kinds", "ids", "task_ids", "labels", "states", "dones", "totals", "notes", "collapsed")
+
+    def __init__(self, records, collapsed):
+        (self.kinds, self.ids, self.task_ids, self.labels, self.states,
+         self.dones, self.totals, self.notes) = list(zip(*records)) or [()] * 8
+        self.collapsed = frozenset(collapsed)
+
+    def __len__(self):
+        return len(self.kinds)
+
+
 def build_tree(db, workspace_id, collapsed, search_query="", show_done_tasks=False):
-    """Build a flat list of rows from the task->step tree for rendering."""
-    rows = []
+    """Build the visible task->step rows for rendering."""
     query = search_query.lower()
-    tasks = get_tasks(db, workspace_id)
-    for t in tasks:
-        tid = t[0]
-        t_status = t[3]
-        if t_status == "done" and not show_done_tasks and not query:
+    # get_tree matches an ASCII search exactly as str.lower() would; anything
+    # else is still matched here.
+    sql_search = query if query.isascii() else ""
+    py_query = "" if sql_search else query
+    # Done tasks are hidden unless asked for, but a search looks through everything.
+    tree = get_tree(db, workspace_id, collapsed, include_done=show_done_tasks or bool(query),
+                    search=sql_search, name_query=py_query)
+    if not py_query:
+        # Already exactly the rows to show, in display order.
+        return Tree(tree, collapsed)
+
+    records = []
+    # Each task row is followed by its steps.
+    for tid, group in groupby(tree, itemgetter(2)):
+        task = next(group)
+        steps = list(group)
+        task_matches = py_query in task[3].lower()
+        matching_steps = [s for s in steps if py_query in s[3].lower() or py_query in s[7].lower()]
+        if not task_matches and not matching_steps:
             continue
-        total, done = step_counts(db, tid)
-        steps = get_steps(db, tid)
-
-        if query:
-            task_matches = query in t[2].lower()
-            matching_steps = [s for s in steps if query in s[2].lower() or query in s[7].lower()]
-            if not task_matches and not matching_steps:
-                continue
-            rows.append({
-                "type": "task", "id": tid, "name": t[2], "total": total, "done": done,
-                "status": t_status, "collapsed": tid in collapsed,
-            })
-            if tid not in collapsed:
-                for s in (matching_steps if not task_matches else steps):
-                    rows.append({
-                        "type": "step", "id": s[0], "task_id": s[1],
-                        "text": s[2], "done": s[3], "priority": s[4], "note": s[7],
-                    })
-        else:
-            rows.append({
-                "type": "task", "id": tid, "name": t[2], "total": total, "done": done,
-                "status": t_status, "collapsed": tid in collapsed,
-            })
-            if tid not in collapsed:
-                for s in steps:
-                    rows.append({
-                        "type": "step", "id": s[0], "task_id": s[1],
-                        "text": s[2], "done": s[3], "priority": s[4], "note": s[7],
-                    })
-    return rows
+        records.append(task)
+        if tid not in collapsed:
+            records.extend(matching_steps if not task_matches else steps)
+    return Tree(records, collapsed)
 
 
 # ── Drawing ─────────────────────────────────────────────────────────────────
 
-def draw_tree(stdscr, rows, cursor_pos, scroll_offset, status_msg, ws_name, search_query=""):
-    stdscr.erase()
-    h, w = stdscr.getmaxyx()
+LIST_TOP = 2
 
-    TITLE = curses.color_pair(1) | curses.A_BOLD
+PRIORITY_ICON = {"high": "!!!", "medium": " ! ", "low": " . "}
+
+
+def row_style(w):
+    """Per-redraw constants for draw_row: the blank fill, colors and bound lookups."""
     HIGH = curses.color_pair(2)
     MED = curses.color_pair(3)
     LOW = curses.color_pair(4)
     DIM = curses.color_pair(5)
-    HELP = curses.color_pair(6)
-    STATUS = curses.color_pair(7) | curses.A_BOLD
-    SELECTED = curses.A_REVERSE
     priority_attr = {"high": HIGH, "medium": MED, "low": LOW}
-    priority_icon = {"high": "!!!", "medium": " ! ", "low": " . "}
     status_attr = {"active": 0, "in_progress": MED | curses.A_BOLD, "done": DIM}
+    return (" " * (w - 1), priority_attr.get, PRIORITY_ICON.get, status_attr.get,
+            MED, LOW, DIM)
+
+
+def draw_row(stdscr, rows, i, row_y, is_sel, w, style):
+    """Paint row i of the tree on screen line row_y."""
+    blank, priority_attr, priority_icon, status_attr, MED, LOW, DIM = style
+    base = curses.A_REVERSE if is_sel else 0
+
+    stdscr.addnstr(row_y, 0, blank, w - 1, base)
+
+    done = rows.dones[i]
+    if rows.kinds[i] == TASK:
+        arrow = "▸" if rows.ids[i] in rows.collapsed else "▾"
+        t_status = rows.states[i]
+        total = rows.totals[i]
+        icon = TASK_STATUS_ICON.get(t_status, " ")
+        count_s = f"[{done}/{total}]"
+        all_done = total > 0 and done == total
+        is_done_task = t_status == "done"
+
+        # Status icon
+        s_attr = status_attr(t_status, 0)
+        stdscr.addnstr(row_y, 1, arrow, 1, base | s_attr)
+        stdscr.addnstr(row_y, 2, icon, 1, base | s_attr)
+
+        name_attr = base | (DIM if is_done_task else (curses.A_BOLD if t_status == "in_progress" else 0))
+        stdscr.addnstr(row_y, 4, rows.labels[i], w - 16, name_attr)
+        stdscr.addnstr(row_y, max(4, w - len(count_s) - 2), count_s, len(count_s),
+                       base | (LOW if all_done or is_done_task else MED))
+    else:
+        check = "[x]" if done else "[ ]"
+        prio = rows.states[i]
+        ptag = priority_icon(prio, " ? ")
+        text = rows.labels[i]
+        note = rows.notes[i]
+        step_attr = base | (DIM if done else 0)
+
+        stdscr.addnstr(row_y, 3, check, 3, step_attr)
+        stdscr.addnstr(row_y, 7, ptag, 3, base | priority_attr(prio, 0))
+
+        # addnstr truncates to max_tw itself, so the text is never sliced here.
+        max_tw = w - 12
+        if note:
+            stdscr.addnstr(row_y, 11, f"{text}  [{note}]", max_tw, step_attr)
+        else:
+            stdscr.addnstr(row_y, 11, text, max_tw, step_attr)
+
+
+# Rows kept in the pad above and below the viewport, so short scrolls are blits.
+PAD_MARGIN = 64
+
+
+def render_pad(rows, top, height, cursor_pos, w):
+    """Paint rows top..top+height-1 into an off-screen pad; scrolling within it is a blit."""
+    pad = curses.newpad(height, w)
+    style = row_style(w)
+    for idx in range(top, min(len(rows), top + height)):
+        draw_row(pad, rows, idx, idx - top, idx == cursor_pos, w, style)
+    return pad
+
+
+def move_cursor(pad, rows, top, old_pos, new_pos, w):
+    """Move the highlight inside the pad by repainting only the two affected rows."""
+    style = row_style(w)
+    height = pad.getmaxyx()[0]
+    for pos, is_sel in ((old_pos, False), (new_pos, True)):
+        if 0 <= pos - top < height:
+            draw_row(pad, rows, pos, pos - top, is_sel, w, style)
+
+
+def show_pad(stdscr, pad, rows, pad_y):
+    """Copy the pad, from line pad_y, into the list area and flush the screen."""
+    h, w = stdscr.getmaxyx()
+    list_bottom = h - 3
+    if rows and list_bottom > LIST_TOP:
+        pad.noutrefresh(pad_y, 0, LIST_TOP, 0, list_bottom - 1, w - 1)
+    curses.doupdate()
+
+
+def draw_tree(stdscr, pad, rows, pad_y, status_msg, ws_name, search_query=""):
+    stdscr.erase()
+    h, w = stdscr.getmaxyx()
+
+    TITLE = curses.color_pair(1) | curses.A_BOLD
+    DIM = curses.color_pair(5)
+    HELP = curses.color_pair(6)
+    STATUS = curses.color_pair(7) | curses.A_BOLD
 
     # Title bar
     title = f" petitcheval  [{ws_name}] "
@@ -178,61 +317,10 @@ def draw_tree(stdscr, rows, cursor_pos, scroll_offset, status_msg, ws_name, sear
     stdscr.addnstr(0, 1, title[:w - 2], w - 2)
     stdscr.attroff(TITLE)
 
-    # List area
-    list_top = 2
-    list_bottom = h - 3
-    visible = list_bottom - list_top
-
+    # List area (the rows themselves live in the pad)
     if not rows:
         msg = "No tasks yet. Press 'A' to add a task."
-        stdscr.addnstr(list_top + 1, max(0, (w - len(msg)) // 2), msg, w - 1, DIM)
-    else:
-        for i in range(visible):
-            idx = i + scroll_offset
-            if idx >= len(rows):
-                break
-            row_y = list_top + i
-            r = rows[idx]
-            is_sel = idx == cursor_pos
-            base = SELECTED if is_sel else 0
-
-            stdscr.addnstr(row_y, 0, " " * (w - 1), w - 1, base)
-
-            if r["type"] == "task":
-                arrow = "▸" if r.get("collapsed") else "▾"
-                t_status = r.get("status", "active")
-                icon = TASK_STATUS_ICON.get(t_status, " ")
-                count_s = f"[{r['done']}/{r['total']}]"
-                all_done = r["total"] > 0 and r["done"] == r["total"]
-                is_done_task = t_status == "done"
-
-                # Status icon
-                s_attr = status_attr.get(t_status, 0)
-                stdscr.addnstr(row_y, 1, arrow, 1, base | s_attr)
-                stdscr.addnstr(row_y, 2, icon, 1, base | s_attr)
-
-                name_attr = base | (DIM if is_done_task else (curses.A_BOLD if t_status == "in_progress" else 0))
-                stdscr.addnstr(row_y, 4, r["name"][:w - 16], w - 16, name_attr)
-                stdscr.addnstr(row_y, max(4, w - len(count_s) - 2), count_s, len(count_s),
-                               base | (LOW if all_done or is_done_task else MED))
-            else:
-                check = "[x]" if r["done"] else "[ ]"
-                prio = r["priority"]
-                ptag = priority_icon.get(prio, " ? ")
-                text = r["text"]
-                note = r.get("note", "")
-                step_attr = base | (DIM if r["done"] else 0)
-
-                stdscr.addnstr(row_y, 3, check, 3, step_attr)
-                stdscr.addnstr(row_y, 7, ptag, 3, base | priority_attr.get(prio, 0))
-
-                if note:
-                    max_tw = w - 12
-                    display = f"{text}  [{note}]"
-                    stdscr.addnstr(row_y, 11, display[:max_tw], max_tw, step_attr)
-                else:
-                    max_tw = w - 12
-                    stdscr.addnstr(row_y, 11, text[:max_tw], max_tw, step_attr)
+        stdscr.addnstr(LIST_TOP + 1, max(0, (w - len(msg)) // 2), msg, w - 1, DIM)
 
     # Status message
     if status_msg:
@@ -248,13 +336,27 @@ def draw_tree(stdscr, rows, cursor_pos, scroll_offset, status_msg, ws_name, sear
     stdscr.addnstr(h - 1, max(0, (w - len(help_text)) // 2), help_text[:w - 1], w - 1)
     stdscr.attroff(HELP)
 
-    stdscr.refresh()
+    stdscr.noutrefresh()
+    show_pad(stdscr, pad, rows, pad_y)
 
 
 # ── Main loop ───────────────────────────────────────────────────────────────
 
 TASK_STATUS_CYCLE = ["active", "in_progress", "done"]
 
+# Writes are committed once the keyboard has been idle this long, so a burst of
+# toggles shares one commit (and one WAL append) instead of one each.
+COMMIT_DELAY_MS = 200
+# ...but never held open longer than this, however fast the keys keep coming:
+# other writers (the CLI) block on the write lock meanwhile.
+COMMIT_MAX_AGE = 1.0  # seconds
+# Keys handled without a prompt; any other key commits pending writes first, so
+# a text prompt, popup or quit never leaves a write transaction open.
+BURST_KEYS = frozenset((
+    "j", "k", "g", "G", "\n", " ", "s", "p", "d",
+    curses.KEY_UP, curses.KEY_DOWN, curses.KEY_DC,
+))
+
 
 def tui_main(stdscr):
     curses.curs_set(0)
@@ -270,11 +372,12 @@ def tui_main(stdscr):
     curses.init_pair(6, curses.COLOR_BLACK, curses.COLOR_WHITE)
     curses.init_pair(7, curses.COLOR_YELLOW, -1)
 
-    from .db import get_db
+    from .db import get_db, get_db_ro
     db = get_db()
+    db_ro = get_db_ro()
 
     # Pick initial workspace
-    ws_row = db.execute("SELECT id, name FROM workspaces ORDER BY id LIMIT 1").fetchone()
+    ws_row = db.execute(SQL_FIRST_WORKSPACE).fetchone()
     current_ws_id, current_ws_name = ws_row[0], ws_row[1]
 
     collapsed = set()
@@ -283,9 +386,24 @@ def tui_main(stdscr):
     status_msg = ""
     search_query = ""
     show_done_tasks = False
+    # The tree only changes when the DB is written or the view inputs change, so
+    # navigation keys reuse the previous rows instead of re-querying.
+    rows, rows_sig, dirty = Tree((), ()), None, True
+    # Rows around the viewport are painted into a pad once per tree; navigation
+    # then only moves the highlight and re-blits, unless the frame around the
+    # list has to change or the viewport leaves the painted window.
+    pad, pad_rows, pad_size, pad_top, pad_cursor = None, None, None, 0, 0
+    drawn_size, drawn_status = None, ""
+    cursor_only = False
+    pending_commit, burst_start = False, None
 
     while True:
-        rows = build_tree(db, current_ws_id, collapsed, search_query, show_done_tasks)
+        sig = (current_ws_id, frozenset(collapsed), search_query, show_done_tasks)
+        if dirty or sig != rows_sig:
+            # Uncommitted writes are only visible to the connection that made them.
+            rows = build_tree(db if pending_commit else db_ro, current_ws_id, collapsed,
+                              search_query, show_done_tasks)
+            rows_sig, dirty = sig, False
         h, w = stdscr.getmaxyx()
         visible = h - 5
 
@@ -299,92 +417,117 @@ def tui_main(stdscr):
             cursor_pos = 0
             scroll_offset = 0
 
-        draw_tree(stdscr, rows, cursor_pos, scroll_offset, status_msg, current_ws_name, search_query)
+        # The pad is sized by the screen, never by the tree.
+        pad_h = max(visible, 1) + 2 * PAD_MARGIN
+        if (rows is not pad_rows or (pad_h, w) != pad_size
+                or not pad_top <= scroll_offset <= pad_top + pad_h - max(visible, 1)):
+            pad_top = max(0, scroll_offset - PAD_MARGIN)
+            pad = render_pad(rows, pad_top, pad_h, cursor_pos, w)
+            pad_rows, pad_size = rows, (pad_h, w)
+        elif cursor_pos != pad_cursor:
+            move_cursor(pad, rows, pad_top, pad_cursor, cursor_pos, w)
+        pad_cursor = cursor_pos
+
+        if cursor_only and (h, w) == drawn_size and not status_msg and not drawn_status:
+            show_pad(stdscr, pad, rows, scroll_offset - pad_top)
+        else:
+            draw_tree(stdscr, pad, rows, scroll_offset - pad_top, status_msg, current_ws_name, search_query)
+            drawn_size, drawn_status = (h, w), status_msg
         status_msg = ""
-
+        cursor_only = False
+
+        ch = None
+        if pending_commit:
+            if burst_start is None:
+                burst_start = monotonic()
+            stdscr.timeout(COMMIT_DELAY_MS)
+            try:
+                ch = stdscr.get_wch()
+            except curses.error:
+                # Idle: commit the burst and keep waiting without a redraw.
+                db.commit()
+                pending_commit, burst_start = False, None
+            stdscr.timeout(-1)
         try:
-            ch = stdscr.get_wch()
+            if ch is None:
+                ch = stdscr.get_wch()
         except curses.error:
             continue
 
+        if pending_commit and (ch not in BURST_KEYS or monotonic() - burst_start >= COMMIT_MAX_AGE):
+            db.commit()
+            pending_commit, burst_start = False, None
+
         if ch == "q" or ch == "Q":
             break
 
         elif ch == "k" or ch == curses.KEY_UP:
             cursor_pos = max(0, cursor_pos - 1)
+            cursor_only = True
 
         elif ch == "j" or ch == curses.KEY_DOWN:
             if rows:
                 cursor_pos = min(len(rows) - 1, cursor_pos + 1)
+            cursor_only = True
 
         elif ch == "g":
             cursor_pos = 0
+            cursor_only = True
 
         elif ch == "G":
             if rows:
                 cursor_pos = len(rows) - 1
+            cursor_only = True
 
         # Toggle collapse on task / toggle done on step
         elif ch == "\n" or ch == " ":
             if rows:
-                r = rows[cursor_pos]
-                if r["type"] == "task":
-                    tid = r["id"]
+                i = cursor_pos
+                if rows.kinds[i] == TASK:
+                    tid = rows.ids[i]
                     if tid in collapsed:
                         collapsed.discard(tid)
                     else:
                         collapsed.add(tid)
                 else:
-                    sid = r["id"]
-                    if r["done"]:
-                        db.execute("UPDATE steps SET done = 0, completed_at = NULL WHERE id = ?", (sid,))
+                    sid = rows.ids[i]
+                    if rows.dones[i]:
+                        db.execute(SQL_STEP_UNDONE, (sid,))
                     else:
-                        db.execute(
-                            "UPDATE steps SET done = 1, completed_at = ? WHERE id = ?",
-                            (datetime.now().isoformat(), sid),
-                        )
-                    db.commit()
-                    status_msg = f"{'Unchecked' if r['done'] else 'Completed'}: {r['text']}"
+                        db.execute(SQL_STEP_DONE, (sid,))
+                    pending_commit = dirty = True
+                    status_msg = f"{'Unchecked' if rows.dones[i] else 'Completed'}: {rows.labels[i]}"
 
         # Cycle task status (s)
         elif ch == "s":
             if rows:
-                r = rows[cursor_pos]
-                if r["type"] == "task":
-                    cur_status = r.get("status", "active")
+                i = cursor_pos
+                if rows.kinds[i] == TASK:
+                    cur_status = rows.states[i]
                     idx = TASK_STATUS_CYCLE.index(cur_status) if cur_status in TASK_STATUS_CYCLE else 0
                     new_status = TASK_STATUS_CYCLE[(idx + 1) % len(TASK_STATUS_CYCLE)]
-                    db.execute("UPDATE tasks SET status = ? WHERE id = ?", (new_status, r["id"]))
-                    db.commit()
-                    status_msg = f"{r['name']}: {new_status}"
+                    db.execute(SQL_SET_TASK_STATUS, (new_status, rows.ids[i]))
+                    pending_commit = dirty = True
+                    status_msg = f"{rows.labels[i]}: {new_status}"
 
         # New task (A)
         elif ch == "A":
             name = textbox_input(stdscr, "New task name (ESC to cancel):")
             if name and name.strip():
                 name = name.strip()
-                now = datetime.now().isoformat()
-                db.execute(
-                    "INSERT INTO tasks (workspace_id, name, status, created_at) VALUES (?, ?, 'active', ?)",
-                    (current_ws_id, name, now),
-                )
-                db.commit()
+                db.execute(SQL_INSERT_TASK, (current_ws_id, name))
+                pending_commit = dirty = True
                 status_msg = f"Created task: {name}"
 
         # New step under current task (a)
         elif ch == "a":
             if rows:
-                r = rows[cursor_pos]
-                task_id = r["id"] if r["type"] == "task" else r["task_id"]
+                task_id = rows.task_ids[cursor_pos]
                 text = textbox_input(stdscr, "New step (ESC to cancel):")
                 if text and text.strip():
                     text = text.strip()
-                    now = datetime.now().isoformat()
-                    db.execute(
-                        "INSERT INTO steps (task_id, text, priority, note, created_at) VALUES (?, ?, 'medium', '', ?)",
-                        (task_id, text, now),
-                    )
-                    db.commit()
+                    db.execute(SQL_INSERT_STEP, (task_id, text))
+                    pending_commit = dirty = True
                     collapsed.discard(task_id)
                     status_msg = f"Added: {text}"
             else:
@@ -393,55 +536,55 @@ def tui_main(stdscr):
         # Edit
         elif ch == "e":
             if rows:
-                r = rows[cursor_pos]
-                if r["type"] == "task":
-                    new_name = textbox_input(stdscr, "Edit task name:", prefill=r["name"])
+                i = cursor_pos
+                if rows.kinds[i] == TASK:
+                    new_name = textbox_input(stdscr, "Edit task name:", prefill=rows.labels[i])
                     if new_name and new_name.strip():
-                        db.execute("UPDATE tasks SET name = ? WHERE id = ?", (new_name.strip(), r["id"]))
-                        db.commit()
+                        db.execute(SQL_RENAME_TASK, (new_name.strip(), rows.ids[i]))
+                        pending_commit = dirty = True
                         status_msg = "Updated task"
                 else:
-                    new_text = textbox_input(stdscr, "Edit step:", prefill=r["text"])
+                    new_text = textbox_input(stdscr, "Edit step:", prefill=rows.labels[i])
                     if new_text and new_text.strip():
-                        db.execute("UPDATE steps SET text = ? WHERE id = ?", (new_text.strip(), r["id"]))
-                        db.commit()
+                        db.execute(SQL_SET_STEP_TEXT, (new_text.strip(), rows.ids[i]))
+                        pending_commit = dirty = True
                         status_msg = "Updated step"
 
         # Add/edit note on step (n)
         elif ch == "n":
             if rows:
-                r = rows[cursor_pos]
-                if r["type"] == "step":
-                    current_note = r.get("note", "")
+                i = cursor_pos
+                if rows.kinds[i] == STEP:
+                    current_note = rows.notes[i]
                     new_note = textbox_input(stdscr, "Note (ESC to cancel):", prefill=current_note)
                     if new_note is not None:
-                        db.execute("UPDATE steps SET note = ? WHERE id = ?", (new_note.strip(), r["id"]))
-                        db.commit()
+                        db.execute(SQL_SET_STEP_NOTE, (new_note.strip(), rows.ids[i]))
+                        pending_commit = dirty = True
                         status_msg = "Updated note" if new_note.strip() else "Cleared note"
 
         # Delete
         elif ch == "d" or ch == curses.KEY_DC:
             if rows:
-                r = rows[cursor_pos]
-                if r["type"] == "task":
-                    db.execute("DELETE FROM tasks WHERE id = ?", (r["id"],))
-                    db.commit()
-                    collapsed.discard(r["id"])
-                    status_msg = f"Deleted task: {r['name']}"
+                i = cursor_pos
+                if rows.kinds[i] == TASK:
+                    db.execute(SQL_DELETE_TASK, (rows.ids[i],))
+                    pending_commit = dirty = True
+                    collapsed.discard(rows.ids[i])
+                    status_msg = f"Deleted task: {rows.labels[i]}"
                 else:
-                    db.execute("DELETE FROM steps WHERE id = ?", (r["id"],))
-                    db.commit()
-                    status_msg = f"Deleted: {r['text']}"
+                    db.execute(SQL_DELETE_STEP, (rows.ids[i],))
+                    pending_commit = dirty = True
+                    status_msg = f"Deleted: {rows.labels[i]}"
 
         # Cycle priority (steps only)
         elif ch == "p":
             if rows:
-                r = rows[cursor_pos]
-                if r["type"] == "step":
+                i = cursor_pos
+                if rows.kinds[i] == STEP:
                     order = ["low", "medium", "high"]
-                    idx = (order.index(r["priority"]) + 1) % 3
-                    db.execute("UPDATE steps SET priority = ? WHERE id = ?", (order[idx], r["id"]))
-                    db.commit()
+                    idx = (order.index(rows.states[i]) + 1) % 3
+                    db.execute(SQL_SET_STEP_PRIORITY, (order[idx], rows.ids[i]))
+                    pending_commit = dirty = True
 
         # Search
         elif ch == "f":
@@ -459,7 +602,7 @@ def tui_main(stdscr):
 
         # Workspace switcher
         elif ch == "w":
-            workspaces = db.execute("SELECT id, name FROM workspaces ORDER BY id").fetchall()
+            workspaces = db.execute(SQL_LIST_WORKSPACES).fetchall()
             options = list(workspaces) + [(-1, "+ New workspace")]
             picked = popup_select(stdscr, "Switch workspace", options, lambda r: r[1])
             if picked:
@@ -467,14 +610,11 @@ def tui_main(stdscr):
                     name = textbox_input(stdscr, "Workspace name:")
                     if name and name.strip():
                         name = name.strip()
-                        now = datetime.now().isoformat()
-                        if db.execute("SELECT 1 FROM workspaces WHERE name = ?", (name,)).fetchone():
+                        if db.execute(SQL_WORKSPACE_EXISTS, (name,)).fetchone():
                             status_msg = f"Workspace '{name}' already exists"
                         else:
-                            cur = db.execute(
-                                "INSERT INTO workspaces (name, created_at) VALUES (?, ?)", (name, now)
-                            )
-                            db.commit()
+                            cur = db.execute(SQL_INSERT_WORKSPACE, (name,))
+                            pending_commit = dirty = True
                             current_ws_id, current_ws_name = cur.lastrowid, name
                             collapsed.clear()
                             cursor_pos, scroll_offset = 0, 0